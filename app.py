@@ -1,17 +1,29 @@
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import numpy as np
 import os
+import orjson
+import time
+import mmap
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 import logging
-from flask import Flask, jsonify
+from flask import Flask, jsonify, url_for
+from flask.json.provider import JSONProvider
 import traceback
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Set up logging
 logging.basicConfig(
@@ -37,58 +49,106 @@ if not ACCESS_TOKEN or not ACCOUNT_ID:
 BASE_URL = f'https://graph.facebook.com/v20.0/act_{ACCOUNT_ID}/insights'
 YESTERDAY = (datetime.now()).strftime('%Y-%m-%d')
 
+# Shared session so Graph API calls reuse pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update({'Authorization': f'Bearer {ACCESS_TOKEN}'})
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 # Define report directory
 REPORT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Serve the cached API response for this long before re-fetching
+CACHE_TTL_SECONDS = 3600
+
+# Give up on the SMTP connect/STARTTLS/login and send after this long
+SMTP_TIMEOUT_SECONDS = 30
+
 def fetch_meta_data():
+    cache_path = os.path.join(REPORT_DIR, f"meta_{YESTERDAY}.json")
+    if os.path.exists(cache_path) and time.time() - os.path.getmtime(cache_path) < CACHE_TTL_SECONDS:
+        try:
+            with open(cache_path, 'rb') as f:
+                data = orjson.loads(f.read())
+            logging.info(f"Using cached API response: {cache_path}")
+            return data
+        except (OSError, orjson.JSONDecodeError) as e:
+            # Treat an unreadable or corrupt cache as a miss; the fresh response overwrites it
+            logging.warning(f"Ignoring unreadable API cache {cache_path}: {str(e)}")
+    
     params = {
-        'access_token': ACCESS_TOKEN,
         'fields': 'campaign_name,spend,impressions,clicks,actions,action_values',
         'time_range': f'{{"since":"{YESTERDAY}","until":"{YESTERDAY}"}}',
         'level': 'campaign',
-        'limit': 100
+        # Let the API drop campaigns with no delivery instead of filtering them out locally
+        'filtering': '[{"field":"impressions","operator":"GREATER_THAN","value":0}]',
+        'limit': 500
     }
+    data = []
     try:
-        response = requests.get(BASE_URL, params=params)
-        response.raise_for_status()
-        return response.json().get('data', [])
-    except requests.exceptions.RequestException as e:
+        response = SESSION.get(BASE_URL, params=params, timeout=30)
+        while True:
+            response.raise_for_status()
+            page = orjson.loads(response.content)
+            data.extend(page.get('data', []))
+            # The next-page URL already carries every query parameter
+            next_url = page.get('paging', {}).get('next')
+            if not next_url:
+                break
+            response = SESSION.get(next_url, timeout=30)
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         logging.error(f"API request failed: {str(e)}")
         raise Exception(f"API request failed: {str(e)}")
+    
+    # Write to a temp file and rename so readers never see a partial cache
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(data))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Failed to write API cache {cache_path}: {str(e)}")
+    return data
+
+def _empty_metrics():
+    return {
+        'total_sales': 0,
+        'total_ad_spend': 0,
+        'overall_roas': 0,
+        'overall_cpa': 0,
+        'overall_ctr': 0,
+        'overall_conversion_rate': 0,
+        'total_impressions': 0,
+        'total_clicks': 0,
+        'active_total_spend': 0,
+        'active_total_sales': 0,
+        'campaign_summary': pd.DataFrame(),
+        'high_roas_campaigns': pd.DataFrame(),
+        'active_campaigns': pd.DataFrame()
+    }
 
 def process_data(raw_data):
     if not raw_data:
         logging.warning("No data returned from API")
-        return {
-            'total_sales': 0,
-            'total_ad_spend': 0,
-            'overall_roas': 0,
-            'overall_cpa': 0,
-            'overall_ctr': 0,
-            'overall_conversion_rate': 0,
-            'total_impressions': 0,
-            'total_clicks': 0,
-            'campaign_summary': pd.DataFrame(),
-            'high_roas_campaigns': pd.DataFrame(),
-            'active_campaigns': pd.DataFrame()
-        }
+        return _empty_metrics()
+    
+    # Extract conversions and sales in a single pass over the raw rows
+    for row in raw_data:
+        actions = row.get('actions') or []
+        action_values = row.get('action_values') or []
+        row['conversions'] = int(next((float(item['value']) for item in actions if item['action_type'] == 'purchase'), 0))
+        row['sales'] = next((float(item['value']) for item in action_values if item['action_type'] == 'purchase'), 0.0)
     
     df = pd.DataFrame(raw_data)
     
     # Convert data types with error handling
-    df['spend'] = pd.to_numeric(df['spend'], errors='coerce').fillna(0).astype(float)
-    df['impressions'] = pd.to_numeric(df['impressions'], errors='coerce').fillna(0).astype(int)
-    df['clicks'] = pd.to_numeric(df['clicks'], errors='coerce').fillna(0).astype(int)
+    num_cols = ['spend', 'impressions', 'clicks']
+    df[num_cols] = df[num_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+    df = df.astype({'spend': float, 'impressions': 'int64', 'clicks': 'int64'})
     
-    # Extract conversions and sales
-    df['conversions'] = df['actions'].apply(
-        lambda x: next((float(item['value']) for item in x if item['action_type'] == 'purchase'), 0)
-        if isinstance(x, list) else 0
-    ).astype(int)
-    df['sales'] = df['action_values'].apply(
-        lambda x: next((float(item['value']) for item in x if item['action_type'] == 'purchase'), 0)
-        if isinstance(x, list) else 0
-    ).astype(float)
+    # Nothing ran (paused account, no delivery): skip the aggregation pipeline entirely
+    if not df[['spend', 'impressions', 'clicks', 'conversions', 'sales']].to_numpy().any():
+        logging.warning("No campaign activity in API data")
+        return _empty_metrics()
     
     # Calculate totals
     total_ad_spend = df['spend'].sum()
@@ -103,28 +163,39 @@ def process_data(raw_data):
     overall_ctr = (total_clicks / total_impressions) * 100 if total_impressions > 0 else 0
     overall_conversion_rate = (total_conversions / total_clicks) * 100 if total_clicks > 0 else 0
     
-    # Campaign-level metrics
-    campaign_summary = df.groupby('campaign_name').agg({
-        'spend': 'sum',
-        'sales': 'sum',
-        'impressions': 'sum',
-        'clicks': 'sum',
-        'conversions': 'sum'
-    }).reset_index()
+    # Campaign-level metrics (single-day insights rarely repeat a campaign, so skip the groupby then)
+    if df['campaign_name'].is_unique:
+        campaign_summary = df[['campaign_name', 'spend', 'sales', 'impressions', 'clicks', 'conversions']].sort_values(
+            by='campaign_name', ignore_index=True
+        )
+    else:
+        campaign_summary = df.groupby('campaign_name').agg({
+            'spend': 'sum',
+            'sales': 'sum',
+            'impressions': 'sum',
+            'clicks': 'sum',
+            'conversions': 'sum'
+        }).reset_index()
     
     # Calculate campaign metrics with safe division
-    campaign_summary['roas'] = (campaign_summary['sales'] / campaign_summary['spend']).replace([float('inf'), -float('inf')], 0).fillna(0)
-    campaign_summary['cpa'] = (campaign_summary['spend'] / campaign_summary['conversions']).replace([float('inf'), -float('inf')], 0).fillna(0)
-    campaign_summary['ctr'] = ((campaign_summary['clicks'] / campaign_summary['impressions']) * 100).replace([float('inf'), -float('inf')], 0).fillna(0)
-    campaign_summary['conversion_rate'] = ((campaign_summary['conversions'] / campaign_summary['clicks']) * 100).replace([float('inf'), -float('inf')], 0).fillna(0)
+    spend = campaign_summary['spend'].to_numpy(dtype=float)
+    sales = campaign_summary['sales'].to_numpy(dtype=float)
+    impressions = campaign_summary['impressions'].to_numpy(dtype=float)
+    clicks = campaign_summary['clicks'].to_numpy(dtype=float)
+    conversions = campaign_summary['conversions'].to_numpy(dtype=float)
+    campaign_summary['roas'] = np.divide(sales, spend, out=np.zeros_like(sales), where=spend > 0)
+    campaign_summary['cpa'] = np.divide(spend, conversions, out=np.zeros_like(spend), where=conversions > 0)
+    campaign_summary['ctr'] = np.divide(clicks * 100, impressions, out=np.zeros_like(clicks), where=impressions > 0)
+    campaign_summary['conversion_rate'] = np.divide(conversions * 100, clicks, out=np.zeros_like(conversions), where=clicks > 0)
     
     # Additional insights
     high_roas_campaigns = campaign_summary[campaign_summary['roas'] > 1]
+    # Counts are non-negative, so a positive sum means at least one of them is non-zero
     active_campaigns = campaign_summary[
-        (campaign_summary['impressions'] > 0) | 
-        (campaign_summary['clicks'] > 0) | 
-        (campaign_summary['conversions'] > 0)
+        (impressions + clicks + conversions) > 0
     ].sort_values(by='roas', ascending=False)
+    active_total_spend = active_campaigns['spend'].sum()
+    active_total_sales = active_campaigns['sales'].sum()
     
     return {
         'total_sales': total_sales,
@@ -135,52 +206,67 @@ def process_data(raw_data):
         'overall_conversion_rate': overall_conversion_rate,
         'total_impressions': total_impressions,
         'total_clicks': total_clicks,
+        'active_total_spend': active_total_spend,
+        'active_total_sales': active_total_sales,
         'campaign_summary': campaign_summary,
         'high_roas_campaigns': high_roas_campaigns,
         'active_campaigns': active_campaigns
     }
 
+# Campaign table layout shared by the ROAS > 1 and Active Campaigns tables
+CAMPAIGN_HEADERS = ["Campaign Name", "Spend", "Sales", "ROAS", "CPA", "CTR", "CR"]
+CAMPAIGN_COL_WIDTHS = [150, 80, 80, 40, 80, 40, 40]  # Adjusted for longer campaign names
+
+def _format_campaign_rows(df):
+    # Format each column in one vectorized pass rather than per row inside the drawing loop
+    names = df['campaign_name']
+    names = names.where(names.str.len() <= 25, names.str[:25] + '...')
+    return list(zip(
+        names,
+        df['spend'].map("Rs {:.2f}".format),
+        df['sales'].map("Rs {:.2f}".format),
+        df['roas'].map("{:.2f}".format),
+        df['cpa'].map("Rs {:.2f}".format),
+        df['ctr'].map("{:.2f}%".format),
+        df['conversion_rate'].map("{:.2f}%".format),
+    ))
+
+# Shared look for every report table: shaded bold header, bordered body rows
+TABLE_STYLE = [
+    ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 12),
+    ('FONT', (0, 1), (-1, -1), 'Helvetica', 12),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.Color(0.9, 0.9, 0.9)),  # Light gray header
+    ('GRID', (0, 1), (-1, -1), 1, colors.black),
+    ('LEFTPADDING', (0, 0), (-1, -1), 5),  # 5 points padding
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+]
+TITLE_STYLE = ParagraphStyle('ReportTitle', fontName='Helvetica-Bold', fontSize=16, leading=20)
+HEADING_STYLE = ParagraphStyle('ReportHeading', fontName='Helvetica-Bold', fontSize=14, leading=18,
+                               spaceBefore=30, spaceAfter=12)
+BODY_STYLE = ParagraphStyle('ReportBody', fontName='Helvetica', fontSize=12, leading=20)
+
+def _build_table(headers, rows, col_widths, extra_style=()):
+    # repeatRows re-draws the header on every page the table spans
+    table = Table([headers] + list(rows), colWidths=col_widths, rowHeights=20, repeatRows=1, hAlign='LEFT')
+    table.setStyle(TableStyle(TABLE_STYLE + list(extra_style)))
+    return table
+
 def generate_pdf_report(metrics):
     report_name = os.path.join(REPORT_DIR, f"report_{YESTERDAY}.pdf")
-    c = canvas.Canvas(report_name, pagesize=letter)
-    width, height = letter
     
     # Define margins (50 points on all sides)
     margin = 50
-    table_width = width - 2 * margin  # Usable width for tables
-    
-    # Starting Y position with top margin
-    y = height - margin
+    doc = SimpleDocTemplate(report_name, pagesize=letter, leftMargin=margin, rightMargin=margin,
+                            topMargin=margin, bottomMargin=margin)
 
     # Title
-    date_part = datetime.now().strftime("%Y-%m-%d")
-    time_part = datetime.now().strftime("%I %p").lstrip("0")  # e.g., "11 AM" instead of "011 AM"
+    now = datetime.now()
+    date_part = now.strftime("%Y-%m-%d")
+    time_part = now.strftime("%I %p").lstrip("0")  # e.g., "11 AM" instead of "011 AM"
     timestamp = f"{date_part} / {time_part}"
-    
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(margin, y, f"Daily Marketing Performance Report ({timestamp})")
-    y -= 20
+    story = [Paragraph(f"Daily Marketing Performance Report ({timestamp})", TITLE_STYLE)]
     
     # Summary Metrics Table
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margin, y, "Summary Metrics")
-    y -= 30
-    
-    # Draw table for summary metrics
-    headers = ["Metric", "Value"]
-    col_widths = [200, 200]  # Adjusted widths for summary table
-    x_positions = [margin, margin + col_widths[0]]
-    
-    # Header row with background
-    c.setFillColorRGB(0.9, 0.9, 0.9)  # Light gray background
-    c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-    c.setFillColorRGB(0, 0, 0)  # Reset to black for text
-    c.setFont("Helvetica-Bold", 12)
-    for i, header in enumerate(headers):
-        c.drawString(x_positions[i] + 5, y, header)  # 5 points padding
-    y -= 20
-    
-    # Draw table rows with borders
     summary_metrics = [
         ("Date", YESTERDAY),
         ("Total Sales", f"Rs {metrics['total_sales']:.2f}"),
@@ -192,171 +278,54 @@ def generate_pdf_report(metrics):
         ("Total Impressions", str(metrics['total_impressions'])),
         ("Total Clicks", str(metrics['total_clicks'])),
     ]
-    c.setFont("Helvetica", 12)
-    for metric, value in summary_metrics:
-        if y < margin:
-            c.showPage()
-            y = height - margin
-            c.setFillColorRGB(0.9, 0.9, 0.9)
-            c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-            c.setFillColorRGB(0, 0, 0)
-            c.setFont("Helvetica-Bold", 12)
-            for i, header in enumerate(headers):
-                c.drawString(x_positions[i] + 5, y, header)
-            y -= 20
-            c.setFont("Helvetica", 12)
-        
-        # Draw cell borders
-        c.rect(margin, y - 5, col_widths[0], 20, stroke=True, fill=False)
-        c.rect(margin + col_widths[0], y - 5, col_widths[1], 20, stroke=True, fill=False)
-        
-        # Draw text with padding
-        c.drawString(x_positions[0] + 5, y, metric)
-        c.drawString(x_positions[1] + 5, y, value)
-        y -= 20
+    story.append(Paragraph("Summary Metrics", ParagraphStyle('FirstHeading', HEADING_STYLE, spaceBefore=0)))
+    story.append(_build_table(["Metric", "Value"], summary_metrics, [200, 200]))
     
     # Campaigns with ROAS > 1 Table
-    y -= 30
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margin, y, "Campaigns with ROAS > 1")
-    y -= 30
-    
+    story.append(Paragraph("Campaigns with ROAS > 1", HEADING_STYLE))
     if not metrics['high_roas_campaigns'].empty:
-        headers = ["Campaign Name", "Spend", "Sales", "ROAS", "CPA", "CTR", "CR"]
-        col_widths = [150, 80, 80, 40, 80, 40, 40]  # Adjusted for longer campaign names
-        x_positions = [margin]
-        for i in range(len(col_widths) - 1):
-            x_positions.append(x_positions[i] + col_widths[i])
-        
-        # Header row with background
-        c.setFillColorRGB(0.9, 0.9, 0.9)
-        c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont("Helvetica-Bold", 12)
-        for i, header in enumerate(headers):
-            c.drawString(x_positions[i] + 5, y, header)
-        y -= 20
-        
-        # Draw table rows with borders
-        c.setFont("Helvetica", 12)
-        for _, row in metrics['high_roas_campaigns'].iterrows():
-            if y < margin:
-                c.showPage()
-                y = height - margin
-                c.setFillColorRGB(0.9, 0.9, 0.9)
-                c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-                c.setFillColorRGB(0, 0, 0)
-                c.setFont("Helvetica-Bold", 12)
-                for i, header in enumerate(headers):
-                    c.drawString(x_positions[i] + 5, y, header)
-                y -= 20
-                c.setFont("Helvetica", 12)
-            
-            # Draw cell borders
-            for i in range(len(col_widths)):
-                c.rect(x_positions[i], y - 5, col_widths[i], 20, stroke=True, fill=False)
-            
-            # Draw text with padding
-            campaign_name = row['campaign_name'][:25] + '...' if len(row['campaign_name']) > 25 else row['campaign_name']
-            c.drawString(x_positions[0] + 5, y, campaign_name)
-            c.drawString(x_positions[1] + 5, y, f"Rs {row['spend']:.2f}")
-            c.drawString(x_positions[2] + 5, y, f"Rs {row['sales']:.2f}")
-            c.drawString(x_positions[3] + 5, y, f"{row['roas']:.2f}")
-            c.drawString(x_positions[4] + 5, y, f"Rs {row['cpa']:.2f}")
-            c.drawString(x_positions[5] + 5, y, f"{row['ctr']:.2f}%")
-            c.drawString(x_positions[6] + 5, y, f"{row['conversion_rate']:.2f}%")
-            y -= 20
+        rows = _format_campaign_rows(metrics['high_roas_campaigns'])
+        story.append(_build_table(CAMPAIGN_HEADERS, rows, CAMPAIGN_COL_WIDTHS))
     else:
-        c.setFont("Helvetica", 12)
-        c.drawString(margin, y, "No campaigns with ROAS > 1")
-        y -= 20
+        story.append(Paragraph("No campaigns with ROAS > 1", BODY_STYLE))
     
     # Active Campaigns Table
-    y -= 30
-    c.setFont("Helvetica-Bold", 14)
-    c.drawString(margin, y, "Active Campaigns")
-    y -= 30
-    
+    story.append(Paragraph("Active Campaigns", HEADING_STYLE))
     if not metrics['active_campaigns'].empty:
-        headers = ["Campaign Name", "Spend", "Sales", "ROAS", "CPA", "CTR", "CR"]
-        col_widths = [150, 80, 80, 40, 80, 40, 40]  # Same widths as above
-        x_positions = [margin]
-        for i in range(len(col_widths) - 1):
-            x_positions.append(x_positions[i] + col_widths[i])
-        
-        # Header row with background
-        c.setFillColorRGB(0.9, 0.9, 0.9)
-        c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont("Helvetica-Bold", 12)
-        for i, header in enumerate(headers):
-            c.drawString(x_positions[i] + 5, y, header)
-        y -= 20
-        
-        # Draw table rows with borders
-        c.setFont("Helvetica", 12)
-        for _, row in metrics['active_campaigns'].iterrows():
-            if y < margin:
-                c.showPage()
-                y = height - margin
-                c.setFillColorRGB(0.9, 0.9, 0.9)
-                c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-                c.setFillColorRGB(0, 0, 0)
-                c.setFont("Helvetica-Bold", 12)
-                for i, header in enumerate(headers):
-                    c.drawString(x_positions[i] + 5, y, header)
-                y -= 20
-                c.setFont("Helvetica", 12)
-            
-            # Draw cell borders
-            for i in range(len(col_widths)):
-                c.rect(x_positions[i], y - 5, col_widths[i], 20, stroke=True, fill=False)
-            
-            # Draw text with padding
-            campaign_name = row['campaign_name'][:25] + '...' if len(row['campaign_name']) > 25 else row['campaign_name']
-            c.drawString(x_positions[0] + 5, y, campaign_name)
-            c.drawString(x_positions[1] + 5, y, f"Rs {row['spend']:.2f}")
-            c.drawString(x_positions[2] + 5, y, f"Rs {row['sales']:.2f}")
-            c.drawString(x_positions[3] + 5, y, f"{row['roas']:.2f}")
-            c.drawString(x_positions[4] + 5, y, f"Rs {row['cpa']:.2f}")
-            c.drawString(x_positions[5] + 5, y, f"{row['ctr']:.2f}%")
-            c.drawString(x_positions[6] + 5, y, f"{row['conversion_rate']:.2f}%")
-            y -= 20
+        rows = _format_campaign_rows(metrics['active_campaigns'])
         
-        # Calculate and display total spend and sales
-        total_spend = metrics['active_campaigns']['spend'].sum()
-        total_sales = metrics['active_campaigns']['sales'].sum()
+        # Display total spend and sales
+        rows.append(("Total", f"Rs {metrics['active_total_spend']:.2f}", f"Rs {metrics['active_total_sales']:.2f}",
+                     "", "", "", ""))
         
-        # Summary row with background
-        if y < margin:
-            c.showPage()
-            y = height - margin
-        
-        c.setFillColorRGB(0.95, 0.95, 0.95)  # Slightly darker gray for summary row
-        c.rect(margin, y - 5, sum(col_widths), 20, fill=True, stroke=False)
-        c.setFillColorRGB(0, 0, 0)
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(x_positions[0] + 5, y, "Total")
-        c.drawString(x_positions[1] + 5, y, f"Rs {total_spend:.2f}")
-        c.drawString(x_positions[2] + 5, y, f"Rs {total_sales:.2f}")
-        # Draw borders for summary row
-        for i in range(len(col_widths)):
-            c.rect(x_positions[i], y - 5, col_widths[i], 20, stroke=True, fill=False)
-        y -= 20
+        # Summary row with a slightly darker gray background
+        story.append(_build_table(CAMPAIGN_HEADERS, rows, CAMPAIGN_COL_WIDTHS, [
+            ('FONT', (0, -1), (-1, -1), 'Helvetica-Bold', 12),
+            ('BACKGROUND', (0, -1), (-1, -1), colors.Color(0.95, 0.95, 0.95)),
+        ]))
     else:
-        c.setFont("Helvetica", 12)
-        c.drawString(margin, y, "No active campaigns")
-        y -= 20
+        story.append(Paragraph("No active campaigns", BODY_STYLE))
     
-    c.save()
+    doc.build(story)
     logging.info(f"PDF report saved to: {report_name}")
     return report_name
 
-def send_email(report_file):
+def open_smtp():
     if not EMAIL_PASSWORD:
         logging.error("Email password not set in environment variables")
         raise ValueError("Email password not set")
     
+    server = smtplib.SMTP('smtp.gmail.com', 587, timeout=SMTP_TIMEOUT_SECONDS)
+    try:
+        server.starttls()
+        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+    except (smtplib.SMTPException, OSError) as e:
+        server.close()
+        logging.error(f"Failed to connect to SMTP server: {str(e)}")
+        raise
+    return server
+
+def send_email(report_file, server=None):
     msg = MIMEMultipart()
     msg['From'] = EMAIL_SENDER
     msg['To'] = ", ".join(EMAIL_RECIPIENTS)
@@ -366,48 +335,157 @@ def send_email(report_file):
     msg.attach(MIMEText(body, 'plain'))
     
     try:
-        with open(report_file, "rb") as attachment:
-            part = MIMEApplication(attachment.read(), Name=os.path.basename(report_file))
+        # Map the PDF instead of reading it; MIMEApplication base64-encodes straight from the mapping
+        with open(report_file, "rb") as attachment, \
+                mmap.mmap(attachment.fileno(), 0, access=mmap.ACCESS_READ) as data, \
+                memoryview(data) as view:
+            part = MIMEApplication(view, Name=os.path.basename(report_file))
             part['Content-Disposition'] = f'attachment; filename="{os.path.basename(report_file)}"'
             msg.attach(part)
     except FileNotFoundError:
         logging.error(f"Report file not found: {report_file}")
         raise
     
+    # A connection passed in by the caller stays open; the caller owns its lifetime
     try:
-        with smtplib.SMTP('smtp.gmail.com', 587) as server:
-            server.starttls()
-            server.login(EMAIL_SENDER, EMAIL_PASSWORD)
+        if server is None:
+            with open_smtp() as server:
+                server.send_message(msg)
+        else:
             server.send_message(msg)
         logging.info("Email sent successfully")
     except smtplib.SMTPException as e:
         logging.error(f"Failed to send email: {str(e)}")
         raise
 
-app = Flask(__name__)
+def _close_smtp_future(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
 
-@app.route('/generate-report', methods=['GET'])
-def generate_report():
+def run_report():
+    logging.info("Report generation started...")
+    # Warm up the SMTP connection while the report is fetched and rendered; the
+    # executor is shut down without waiting so an error below never blocks on the handshake
+    executor = ThreadPoolExecutor(max_workers=1)
+    smtp_future = executor.submit(open_smtp)
+    executor.shutdown(wait=False)
     try:
-        logging.info("Report generation started...")
         data = fetch_meta_data()
         metrics = process_data(data)
         report_file = generate_pdf_report(metrics)
-        send_email(report_file)
-        logging.info("Report generation and email completed successfully.")
-        return jsonify({
-            'status': 'success',
-            'message': 'Report generated and sent via email.',
-            'report_file': report_file
-        })
+    except Exception:
+        if not smtp_future.cancel():
+            smtp_future.add_done_callback(_close_smtp_future)
+        raise
+    # Closing the connection is tied to this block so any send_email failure releases it
+    with smtp_future.result() as server:
+        send_email(report_file, server)
+    logging.info("Report generation and email completed successfully.")
+    return report_file
+
+def _run_report_job():
+    # Log failures from the worker thread; the exception itself is kept on the future for /status
+    try:
+        return run_report()
     except Exception as e:
         logging.error(f"Error during report generation: {str(e)}")
-        traceback_str = traceback.format_exc()
+        raise
+
+class ORJSONProvider(JSONProvider):
+    # Encode jsonify responses with orjson, matching how the Meta API payload is decoded
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Reports run off the request thread; a single worker keeps jobs from writing the same report file at once.
+# Job state lives in this process's memory, so /status only sees jobs started by the same worker.
+REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+REPORT_JOBS = OrderedDict()
+REPORT_JOBS_LOCK = threading.Lock()
+MAX_REPORT_JOBS = 20
+
+# A job still unfinished after this long is reported as timed out and no longer reused
+MAX_REPORT_RUNTIME_SECONDS = 900
+
+def _job_timed_out(future, submitted_at):
+    return not future.done() and time.monotonic() - submitted_at > MAX_REPORT_RUNTIME_SECONDS
+
+def _submit_report_job():
+    global REPORT_EXECUTOR
+    with REPORT_JOBS_LOCK:
+        # Reuse a pending or running job instead of queueing another report
+        stalled = False
+        for job_id, (future, submitted_at) in REPORT_JOBS.items():
+            if future.done():
+                continue
+            if not _job_timed_out(future, submitted_at):
+                return job_id, False
+            stalled = True
+        
+        if stalled:
+            # The stuck thread cannot be killed; abandon its worker so new reports are not queued behind it
+            logging.error(f"Report job exceeded {MAX_REPORT_RUNTIME_SECONDS}s; starting a fresh report worker")
+            REPORT_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+            REPORT_EXECUTOR = ThreadPoolExecutor(max_workers=1)
+        
+        job_id = uuid.uuid4().hex
+        REPORT_JOBS[job_id] = (REPORT_EXECUTOR.submit(_run_report_job), time.monotonic())
+        
+        # Drop the oldest finished or timed-out jobs once the table is full
+        for old_id in [jid for jid, (future, submitted_at) in REPORT_JOBS.items()
+                       if future.done() or _job_timed_out(future, submitted_at)]:
+            if len(REPORT_JOBS) <= MAX_REPORT_JOBS:
+                break
+            del REPORT_JOBS[old_id]
+        return job_id, True
+
+@app.route('/generate-report', methods=['GET'])
+def generate_report():
+    job_id, started = _submit_report_job()
+    return jsonify({
+        'status': 'accepted',
+        'message': 'Report generation started.' if started else 'Report generation already in progress.',
+        'job_id': job_id,
+        'status_url': url_for('report_status', job_id=job_id)
+    }), 202
+
+@app.route('/status/<job_id>', methods=['GET'])
+def report_status(job_id):
+    with REPORT_JOBS_LOCK:
+        job = REPORT_JOBS.get(job_id)
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f'Unknown job id: {job_id}'
+        }), 404
+    future, submitted_at = job
+    if _job_timed_out(future, submitted_at):
+        return jsonify({
+            'status': 'error',
+            'message': f'Report job timed out after {MAX_REPORT_RUNTIME_SECONDS} seconds.',
+            'job_id': job_id
+        }), 500
+    if not future.done():
+        return jsonify({'status': 'running', 'job_id': job_id}), 200
+    
+    error = future.exception()
+    if error is not None:
+        traceback_str = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
         return jsonify({
             'status': 'error',
-            'message': str(e),
+            'message': str(error),
             'trace': traceback_str
         }), 500
+    return jsonify({
+        'status': 'success',
+        'message': 'Report generated and sent via email.',
+        'report_file': future.result()
+    })
 
 @app.route('/health', methods=['GET'])
 def health_check():